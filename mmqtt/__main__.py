@@ -8,9 +8,9 @@ Meshtastic software components are released under various licenses—see GitHub
 No warranty is provided. Use at your own risk.
 """
 
-import time
 from mmqtt.load_config import ConfigLoader
 from mmqtt.argument_parser import handle_args, get_args
+from mmqtt.utils import wait_for_interrupt
 from mmqtt import configure, connect, disconnect, enable_verbose
 
 
@@ -23,18 +23,15 @@ def start() -> None:
 
     configure(config)
 
-    if args.listen:
+    if args.listen or args.verbose:
         enable_verbose(True)
 
     connect()
     handle_args()
 
     if config.mode.listen:
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("Disconnected cleanly on exit.")
+        wait_for_interrupt()
+        print("Disconnected cleanly on exit.")
     disconnect()
 
 
@@ -1,11 +1,15 @@
 import argparse
+import functools
 import time
 import sys
+from pathlib import Path
 from types import SimpleNamespace
-from typing import Tuple
+from typing import List, Optional, Tuple
+
+import paho.mqtt.client as mqtt
 
 from mmqtt.load_config import ConfigLoader
-from mmqtt.utils import validate_lat_lon_alt, str_with_empty, float_or_int, str2bool
+from mmqtt.utils import validate_lat_lon_alt, str_with_empty, float_or_int, non_negative_float, str2bool, wait_for_interrupt
 from mmqtt.tx_message_handler import (
     send_position,
     send_text_message,
@@ -16,9 +20,68 @@ from mmqtt.tx_message_handler import (
 )
 
 
-def get_args() -> Tuple[argparse.ArgumentParser, argparse.Namespace]:
-    """Define and parse command-line arguments."""
-    parser = argparse.ArgumentParser(description="Meshtastic MQTT client")
+# Namespace returned when no CLI arguments are given; must mirror the defaults in _build_parser().
+_DEFAULTS = {
+    'config': 'config.json',
+    'node_id': None, 'node_long_name': None, 'node_short_name': None, 'node_role': None,
+    'node_hw_model': None, 'node_is_unmessagable': None, 'channel_preset': None, 'channel_key': None,
+    'destination': None, 'hop_limit': None, 'priority': None,
+    'message': None, 'message_file': None,
+    'nodeinfo': False,
+    'battery': None, 'voltage': None, 'chutil': None, 'airtxutil': None, 'uptime': None, 'telemetry': False,
+    'lat': None, 'lon': None, 'alt': None, 'precision': None, 'position': False,
+    'temperature': None, 'humidity': None, 'pressure': None, 'lux': None, 'wind_dir': None,
+    'wind_speed': None, 'weight': None, 'radiation': None, 'environment': False,
+    'ch1_voltage': None, 'ch1_current': None, 'ch2_voltage': None, 'ch2_current': None,
+    'ch3_voltage': None, 'ch3_current': None, 'power': False,
+    'listen': False,
+    'verbose': False,
+    'min_interval': 3.0,
+}
+
+# Earliest monotonic time at which the next message may be sent.
+_next_allowed = time.monotonic()
+
+
+def _rate_limit(interval: float) -> None:
+    """Sleep only for the time remaining until the next send slot, then reserve the following one."""
+    global _next_allowed
+    now = time.monotonic()
+    if now < _next_allowed:
+        time.sleep(_next_allowed - now)
+    _next_allowed = max(now, _next_allowed) + interval
+
+
+def _send_text_messages(messages: List[str], interval: float, _overrides: dict) -> None:
+    """
+    Publish text messages paced by the rate limiter, without waiting for each publish to
+    complete. paho's network thread flushes them in the background; completion is awaited
+    once for the whole batch at the end.
+    """
+    pending = []
+    for msg in messages:
+        _rate_limit(interval)
+        pending.append(send_text_message(msg, use_config=True, _overrides=_overrides))
+    _wait_for_publish(pending)
+
+
+def _wait_for_publish(infos: List[Optional[mqtt.MQTTMessageInfo]], timeout: float = 5) -> None:
+    """Block until each publish is handed to the broker, or the timeout expires. None entries are skipped."""
+    for info in infos:
+        if info is None:
+            continue
+        try:
+            info.wait_for_publish(timeout=timeout)
+            if not info.is_published():
+                print(f"Timed out after {timeout}s waiting for publish of message {info.mid}.")
+        except (RuntimeError, ValueError) as e:
+            print(f"Error while waiting for publish: {e}")
+
+
+@functools.lru_cache(maxsize=1)
+def _build_parser() -> argparse.ArgumentParser:
+    """Define command-line arguments. Built once and reused for every parse."""
+    parser = argparse.ArgumentParser(description="Meshtastic MQTT client", add_help=True)
 
     parser.add_argument('--config', type=str, default='config.json', help='Path to the config file')
     # Node and Channel Settings
@@ -71,154 +134,206 @@ def get_args() -> Tuple[argparse.ArgumentParser, argparse.Namespace]:
     parser.add_argument('--power', action='store_true', help='Send power from config or overridden by --ch1_voltage/ch1_current/ch2_voltage/ch2_current/ch3_voltage/ch3_current')
     # Start Listener
     parser.add_argument('--listen', action='store_true', help='Enable listening for incoming MQTT messages')
+    parser.add_argument('--verbose', action='store_true', help='Log every field of sent and received messages')
+    # Send Rate
+    parser.add_argument('--min-interval', type=non_negative_float, default=3.0, metavar='SECONDS', help='Minimum seconds between sent messages (Default: 3.0)')
     # parser.add_argument('--use-args', action='store_true', help='Use values from config.json instead of client attributes')
 
+    return parser
+
+
+def get_args() -> Tuple[Optional[argparse.ArgumentParser], argparse.Namespace]:
+    """
+    Parse command-line arguments.
+    Returns:
+        The parser and the parsed namespace. When no arguments are given, argparse is
+        skipped entirely and the parser is None.
+    """
+    if len(sys.argv) == 1:
+        return None, argparse.Namespace(**_DEFAULTS)
+
+    parser = _build_parser()
     args = parser.parse_args()
     return parser, args
 
 
+# Send keyword -> CLI argument name. Values come from the CLI argument, then the config
+# section under the send keyword, then the config section under the CLI argument name.
+_NODEINFO_FIELDS = {
+    'id': 'node_id',
+    'long_name': 'node_long_name',
+    'short_name': 'node_short_name',
+    'hw_model': 'node_hw_model',
+    'role': 'node_role',
+}
+_TELEMETRY_FIELDS = {
+    'battery_level': 'battery',
+    'voltage': 'voltage',
+    'channel_utilization': 'chutil',
+    'air_util_tx': 'airtxutil',
+    'uptime_seconds': 'uptime',
+}
+_ENVIRONMENT_FIELDS = {
+    'temperature': 'temperature',
+    'relative_humidity': 'humidity',
+    'barometric_pressure': 'pressure',
+    'lux': 'lux',
+    'wind_direction': 'wind_dir',
+    'wind_speed': 'wind_speed',
+    'weight': 'weight',
+    'radiation': 'radiation',
+}
+_POWER_FIELDS = {
+    'ch1_voltage': 'ch1_voltage',
+    'ch1_current': 'ch1_current',
+    'ch2_voltage': 'ch2_voltage',
+    'ch2_current': 'ch2_current',
+    'ch3_voltage': 'ch3_voltage',
+    'ch3_current': 'ch3_current',
+}
+
+
+def _resolve(args: argparse.Namespace, cfg: SimpleNamespace, mapping: dict) -> dict:
+    """Build send keyword arguments from CLI arguments, falling back to the config section."""
+    return {
+        dst: getattr(args, src) or getattr(cfg, dst, None) or getattr(cfg, src, None)
+        for dst, src in mapping.items()
+    }
+
+
+def _do_nodeinfo(parser: argparse.ArgumentParser, args: argparse.Namespace, config: SimpleNamespace, _overrides: dict) -> None:
+    node = config.nodeinfo 
+
+    if args.node_is_unmessagable == False:
+        is_unmessagable = False
+    elif args.node_is_unmessagable == True:
+        is_unmessagable = True
+    else:
+        is_unmessagable = getattr(node, 'is_unmessagable', None) or None
+    
+    #send_nodeinfo(node.id, node.long_name, node.short_name)
+    _rate_limit(args.min_interval)
+    info = send_nodeinfo(
+        **_resolve(args, node, _NODEINFO_FIELDS),
+        is_unmessagable = is_unmessagable,
+        use_config = True,
+        _overrides = _overrides
+    )
+    _wait_for_publish([info])
+
+
+def _do_messages(parser: argparse.ArgumentParser, args: argparse.Namespace, config: SimpleNamespace, _overrides: dict) -> None:
+    _send_text_messages(args.message, args.min_interval, _overrides)
+
+
+def _do_message_file(parser: argparse.ArgumentParser, args: argparse.Namespace, config: SimpleNamespace, _overrides: dict) -> None:
+    try:
+        text = Path(args.message_file).read_text(encoding='utf-8')
+    except FileNotFoundError:
+        print(f"Message file '{args.message_file}' not found.")
+    else:
+        file_lines = [line.strip() for line in text.splitlines() if line.strip()]
+        _send_text_messages(file_lines, args.min_interval, _overrides)
+
+
+def _do_position(parser: argparse.ArgumentParser, args: argparse.Namespace, config: SimpleNamespace, _overrides: dict) -> None:
+    position = config.position
+    lat = args.lat if args.lat is not None else position.lat
+    lon = args.lon if args.lon is not None else position.lon
+    alt = args.alt if args.alt is not None else position.alt
+    precision = args.precision if args.precision is not None else position.precision
+    validate_lat_lon_alt(parser, argparse.Namespace(lat=lat, lon=lon, alt=alt))
+    _rate_limit(args.min_interval)
+    info = send_position(lat, lon, alt, precision, use_config=True, _overrides = _overrides)
+    _wait_for_publish([info])
+
+
+def _do_telemetry(parser: argparse.ArgumentParser, args: argparse.Namespace, config: SimpleNamespace, _overrides: dict) -> None:
+    telemetry = config.telemetry
+    
+    _rate_limit(args.min_interval)
+    info = send_device_telemetry(
+        **_resolve(args, telemetry, _TELEMETRY_FIELDS),
+        use_config=True,
+        _overrides = _overrides
+    )
+    _wait_for_publish([info])
+
+
+def _do_environment(parser: argparse.ArgumentParser, args: argparse.Namespace, config: SimpleNamespace, _overrides: dict) -> None:
+    environment = config.environment
+    _rate_limit(args.min_interval)
+    info = send_environment_metrics(
+        **_resolve(args, environment, _ENVIRONMENT_FIELDS),
+        use_config=True,
+        _overrides = _overrides
+    )
+    _wait_for_publish([info])
+
+
+def _do_power(parser: argparse.ArgumentParser, args: argparse.Namespace, config: SimpleNamespace, _overrides: dict) -> None:
+    power = config.power
+    _rate_limit(args.min_interval)
+    info = send_power_metrics(
+        **_resolve(args, power, _POWER_FIELDS),
+        use_config=True,
+        _overrides = _overrides
+    )
+    _wait_for_publish([info])
+
+
+# Send actions in the order they are performed, keyed by the argument that enables them.
+_ACTIONS = [
+    ("nodeinfo", _do_nodeinfo),
+    ("message", _do_messages),
+    ("message_file", _do_message_file),
+    ("position", _do_position),
+    ("telemetry", _do_telemetry),
+    ("environment", _do_environment),
+    ("power", _do_power),
+]
+
+
 def handle_args() -> argparse.Namespace:
     """
     Process and handle CLI arguments to trigger various MQTT message actions.
     Returns:
         argparse.Namespace: Parsed argument namespace
     """
+    from mmqtt import client
+
     parser, args = get_args()
     config: SimpleNamespace = ConfigLoader.get_config(args.config)
+    client.listening = bool(args.listen or getattr(config.mode, 'listen', False))
     
-    arg_order = sys.argv[1:]
-    
-    messages = args.message or []
-    
-    channel_key = ""
-    if args.channel_key is None:
-        channel_key = None
-    elif args.channel_key == "":
-        channel_key = ''
-    else:
-        channel_key = args.channel_key
-    
+    channel_key = args.channel_key
+
     _overrides = {
-        "node_id": getattr(args, 'node_id', None) or None,
-#        "node_long_name": getattr(args, 'node_long_name', None) or None,
-#        "node_short_name": getattr(args, 'node_short_name', None) or None,
-#        "node_hw_model": getattr(args, 'node_hw_model', None) or None,
-        "channel_preset": getattr(args, 'channel_preset', None) or None,
+        "node_id": args.node_id or None,
+#        "node_long_name": args.node_long_name or None,
+#        "node_short_name": args.node_short_name or None,
+#        "node_hw_model": args.node_hw_model or None,
+        "channel_preset": args.channel_preset or None,
         "channel_key": channel_key,
-        "destination": getattr(args, 'destination', None) or None,
-        "hop_limit": getattr(args, 'hop_limit', None) or None,
-        "priority": getattr(args, 'priority', None) or None,
+        "destination": args.destination or None,
+        "hop_limit": args.hop_limit or None,
+        "priority": args.priority or None,
     }
 
-    for arg in arg_order:
-        if arg == "--nodeinfo" and args.nodeinfo:
-            node = config.nodeinfo 
-
-            if args.node_is_unmessagable == False:
-                is_unmessagable = False
-            elif args.node_is_unmessagable == True:
-                is_unmessagable = True
-            else:
-                is_unmessagable = getattr(node, 'is_unmessagable', None) or None
-            
-            #send_nodeinfo(node.id, node.long_name, node.short_name)
-            send_nodeinfo(
-                id = getattr(args, 'node_id', None) or getattr(node, 'id', None) or None,
-                long_name = getattr(args, 'node_long_name', None) or getattr(node, 'long_name', None) or None,
-                short_name = getattr(args, 'node_short_name', None) or getattr(node, 'short_name', None) or None,
-                hw_model = getattr(args, 'node_hw_model', None) or getattr(node, 'hw_model', None) or None,
-                role = getattr(args, 'node_role', None) or getattr(node, 'role', None) or None,
-                is_unmessagable = is_unmessagable,
-                use_config = True,
-                _overrides = _overrides
-            )
-            time.sleep(3)
-            
-        elif arg == "--message" and messages:
-            for msg in messages:
-                send_text_message(msg, use_config=True, _overrides = _overrides)
-                time.sleep(3)
-            messages = []  # prevent duplicate sending
-
-        elif arg == "--message-file" and args.message_file:
-            try:
-                with open(args.message_file, 'r', encoding='utf-8') as f:
-                    file_lines = [line.strip() for line in f if line.strip()]
-                    for msg in file_lines:
-                        send_text_message(msg, use_config=True)
-                        time.sleep(3)
-            except FileNotFoundError:
-                print(f"Message file '{args.message_file}' not found.")
-
-        elif arg == "--position" and args.position:
-            position = config.position
-            lat = args.lat if args.lat is not None else position.lat
-            lon = args.lon if args.lon is not None else position.lon
-            alt = args.alt if args.alt is not None else position.alt
-            precision = args.precision if args.precision is not None else position.precision
-            validate_lat_lon_alt(parser, argparse.Namespace(lat=lat, lon=lon, alt=alt))
-            send_position(lat, lon, alt, precision, use_config=True, _overrides = _overrides)
-            time.sleep(3)
-
-        elif arg == "--telemetry" and args.telemetry:
-            telemetry = config.telemetry
-            
-            send_device_telemetry(
-                battery_level = getattr(args, 'battery', None) or getattr(telemetry, 'battery_level', None) or None,
-                voltage = getattr(args, 'voltage', None) or getattr(telemetry, 'voltage', None) or None,
-                channel_utilization = getattr(args, 'channel_utilization', None) or getattr(telemetry, 'chutil', None) or getattr(telemetry, 'channel_utilization', None) or None,
-                air_util_tx = getattr(args, 'air_util_tx', None) or getattr(telemetry, 'airtxutil', None) or getattr(telemetry, 'air_util_tx', None) or None,
-                uptime_seconds = getattr(args, 'uptime_seconds', None) or getattr(telemetry, 'uptime', None) or getattr(telemetry, 'uptime_seconds', None) or None,
-                use_config=True,
-                _overrides = _overrides
-            )
-            time.sleep(3)
-
-        elif arg == "--environment" and args.environment:
-            environment = config.environment
-            send_environment_metrics(
-                temperature = getattr(args, 'temperature', None) or getattr(environment, 'temperature', None) or None,
-                relative_humidity = getattr(args, 'humidity', None) or getattr(environment, 'humidity', None) or None,
-                barometric_pressure = getattr(args, 'pressure', None) or getattr(environment, 'pressure', None) or None,
-                lux = getattr(args, 'lux', None) or getattr(environment, 'lux', None) or None,
-                wind_direction = getattr(args, 'wind_dir', None) or getattr(environment, 'wind_direction', None) or None,
-                wind_speed = getattr(args, 'wind_speed', None) or getattr(environment, 'wind_speed', None) or None,
-                weight = getattr(args, 'weight', None) or getattr(environment, 'weight', None) or None,
-                radiation = getattr(args, 'radiation', None) or getattr(environment, 'radiation', None) or None,
-                use_config=True,
-                _overrides = _overrides
-            )
-            time.sleep(3)
-            
-        elif arg == "--power" and args.power:
-            power = config.power
-            send_power_metrics(
-                ch1_voltage = getattr(args, 'ch1_voltage', None) or getattr(power, 'ch1_voltage', None) or None,
-                ch1_current = getattr(args, 'ch1_current', None) or getattr(power, 'ch1_current', None) or None,
-                ch2_voltage = getattr(args, 'ch2_voltage', None) or getattr(power, 'ch2_voltage', None) or None,
-                ch2_current = getattr(args, 'ch2_current', None) or getattr(power, 'ch2_current', None) or None,
-                ch3_voltage = getattr(args, 'ch3_voltage', None) or getattr(power, 'ch3_voltage', None) or None,
-                ch3_current = getattr(args, 'ch3_current', None) or getattr(power, 'ch3_current', None) or None,
-                use_config=True,
-                _overrides = _overrides
-            )
-            time.sleep(3)
+    for flag, action in _ACTIONS:
+        if getattr(args, flag):
+            action(parser, args, config, _overrides)
 
     # Listen Mode
     if args.listen:
-        from mmqtt import client
-        client.enable_verbose(True)
         config.listen_mode = True
         
         print("Starting MQTT listener (press Ctrl+C to stop)...")
 
         client.subscribe()
 
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("Exiting listener.")
-            client.disconnect()
+        wait_for_interrupt()
+        print("Exiting listener.")
+        client.disconnect()
 
     return args
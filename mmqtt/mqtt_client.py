@@ -16,6 +16,7 @@ class Client:
         self.client = mqtt.Client()
         self.connected = False
         self.verbose = False
+        self.listening = False
 
     def enable_verbose(self, enabled: bool = True):
         self.verbose = enabled
@@ -69,9 +70,10 @@ class Client:
         if self.root_topic:
             self.client.subscribe(f"{self.root_topic}/2/e/{self.channel}")
 
-    def publish(self, topic, payload):
+    def publish(self, topic, payload, qos=0, retain=False):
         if self.connected:
-            self.client.publish(topic, payload)
+            return self.client.publish(topic, payload, qos=qos, retain=retain)
+        return None
 
     def disconnect(self):
         self.client.loop_stop()
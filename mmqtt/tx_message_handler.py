@@ -1,8 +1,12 @@
 import random
 import re
+import threading
 import time
-from typing import Callable
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
 
+import paho.mqtt.client as mqtt
 from meshtastic import portnums_pb2, mesh_pb2, mqtt_pb2, telemetry_pb2
 
 from mmqtt.encryption import encrypt_packet, generate_hash
@@ -11,6 +15,16 @@ from mmqtt.utils import get_message_id
 
 _config = None
 message_id = random.getrandbits(32)
+_RESERVED_IDS = frozenset({1, 2, 3, 4, 0xFFFFFFFF})
+_MESH_PACKET = mesh_pb2.MeshPacket()
+_ENVELOPE = mqtt_pb2.ServiceEnvelope()
+_PACKET_LOCK = threading.Lock()
+_LOG_EXCLUDE = frozenset({"use_config", "to", "_overrides", "data", "latitude_i", "longitude_i"})
+_TEXT = portnums_pb2.TEXT_MESSAGE_APP
+_NODEINFO = portnums_pb2.NODEINFO_APP
+_POSITION = portnums_pb2.POSITION_APP
+_TELEMETRY = portnums_pb2.TELEMETRY_APP
+_PORTNUM_NAMES = {number: name for name, number in portnums_pb2.PortNum.items()}
 
 
 def _get_config():
@@ -20,235 +34,274 @@ def _get_config():
     return _config
 
 
+@lru_cache(maxsize=8)
+def _resolve_node(node_id: str) -> Tuple[str, int, str]:
+    """Return the node ID, its node number and the gateway ID derived from it."""
+    if not node_id.startswith("!"):
+        raise ValueError("Node ID must start with '!'")
+    return node_id, int(node_id[1:], 16), node_id.lower()
+
+
+@lru_cache(maxsize=16)
+def _topic(root: str, channel: str, node_id: str) -> str:
+    """Return the MQTT publish topic for a node on a channel."""
+    return f"{root}/2/e/{channel}/{node_id.lower()}"
+
+
 def get_portnum_name(portnum: int) -> str:
-    for name, number in portnums_pb2.PortNum.items():
-        if number == portnum:
-            return name
-    return f"UNKNOWN_PORTNUM ({portnum})"
+    return _PORTNUM_NAMES.get(portnum, f"UNKNOWN_PORTNUM ({portnum})")
+
+
+@dataclass
+class _ResolvedCtx:
+    """Per-send values resolved once from CLI overrides, the config file or the client."""
+
+    topic: str
+    gateway_id: str
+    from_id: int
+    channel_id: str
+    channel_key: str
+    destination: int
+    hop_limit: Optional[int] = None
+    priority: Optional[str] = None
+
+
+def _resolve_ctx(**kwargs) -> _ResolvedCtx:
+    """Resolve topic, sender, channel and destination for a single send."""
+    _overrides = kwargs.get("_overrides") or {}
+
+    if kwargs.get("use_config", False):
+        config = _get_config()
+        root_topic = config.mqtt.root_topic
+        node_id = config.nodeinfo.id
+        channel_id = config.channel.preset
+        channel_key = config.channel.key
+        destination = config.message.destination_id
+    else:
+        from mmqtt import client
+
+        root_topic = client.root_topic
+        node_id = client.node_id
+        channel_id = client.channel
+        channel_key = client.key
+        destination = client.destination_id
+
+    node_id, from_id, gateway_id = _resolve_node(_overrides.get("node_id") or node_id)
+    if from_id in _RESERVED_IDS:
+        raise ValueError(f"Node ID '{from_id}' is reserved and cannot be used. Please choose a different ID.")
+
+    channel_id = _overrides.get("channel_preset") or channel_id
+    if _overrides.get("channel_key") is not None:
+        channel_key = _overrides["channel_key"]
+    if _overrides.get("destination") is not None:
+        destination = _overrides["destination"]
+    elif kwargs.get("to") is not None:
+        destination = kwargs["to"]
+
+    return _ResolvedCtx(
+        topic=_topic(root_topic, channel_id, node_id),
+        gateway_id=gateway_id,
+        from_id=from_id,
+        channel_id=channel_id,
+        channel_key=channel_key,
+        destination=int(destination),
+        hop_limit=_overrides.get("hop_limit"),
+        priority=_overrides.get("priority"),
+    )
 
 
-def publish_message(payload_function: Callable, portnum: int, **kwargs) -> None:
-    """Send a message of any type, with logging."""
+def publish_message(payload_function: Callable, portnum: int, **kwargs) -> Optional[mqtt.MQTTMessageInfo]:
+    """Send a message of any type, with logging. Returns paho's MQTTMessageInfo, or None if nothing was sent."""
 
     from mmqtt import client
-    
-    use_config = kwargs.get("use_config", False)
-    _overrides = kwargs.get("_overrides", False)
 
     try:
-        if use_config:
-            config = _get_config()
-            config.nodeinfo.id = _overrides['node_id'] or config.nodeinfo.id
-            config.channel.preset = _overrides['channel_preset'] or config.channel.preset
-            topic = f"{config.mqtt.root_topic}/2/e/{config.channel.preset}/{config.nodeinfo.id.lower()}"
-        else:
-            client.node_id = _overrides['node_id'] or client.node_id
-            client.channel = _overrides['channel_preset'] or client.channel
-            topic = f"{client.root_topic}/2/e/{client.channel}/{client.node_id.lower()}"
-
-        destination = kwargs.get("to")
-        if destination is None:
-            destination = _get_config().message.destination_id if use_config else client.destination_id
-            if _overrides['destination'] is not None:
-                destination = _overrides['destination']
-        payload = payload_function(portnum=portnum, **kwargs)
+        ctx = _resolve_ctx(**kwargs)
+        payload = payload_function(portnum=portnum, _ctx=ctx, **kwargs)
         
         print(f"\n[TX] Portnum = {get_portnum_name(portnum)} ({portnum})")
-        print(f"     Topic: '{topic}'")
-        print(f"     To: {destination}")
-        for k, v in kwargs.items():
-            if k not in ("use_config", "to", "_overrides") and v is not None:
-                print(f"     {k}: {v}")
+        print(f"     Topic: '{ctx.topic}'")
+        print(f"     To: {ctx.destination}")
+        if client.verbose:
+            for k, v in kwargs.items():
+                if v is not None and k not in _LOG_EXCLUDE:
+                    print(f"     {k}: {v}")
 
-        client.publish(topic, payload)
+        # Fire-and-forget for TX-only runs; when the client is also listening, get broker acknowledgement.
+        qos = 1 if client.listening else 0
+        return client.publish(ctx.topic, payload, qos=qos, retain=False)
 
     except Exception as e:
         print(f"Error while sending message: {e}")
+        return None
 
 
 def create_payload(data, portnum: int, bitfield: int = 1, **kwargs) -> bytes:
     """Generalized function to create a payload."""
     encoded_message = mesh_pb2.Data()
     encoded_message.portnum = portnum
-    encoded_message.payload = data.SerializeToString() if hasattr(data, "SerializeToString") else data
+    # Meshtastic protobufs are proto3 (no required fields), so the partial serializer is equivalent and skips the check.
+    encoded_message.payload = data.SerializePartialToString() if hasattr(data, "SerializePartialToString") else data
     encoded_message.want_response = kwargs.get("want_response", False)
     encoded_message.bitfield = bitfield
     return generate_mesh_packet(encoded_message, **kwargs)
 
 
 def generate_mesh_packet(encoded_message: mesh_pb2.Data, **kwargs) -> bytes:
-    """Generate the final mesh packet."""
+    """Generate the final mesh packet. Config is only resolved here when called outside publish_message."""
 
-    use_config = kwargs.get("use_config", False)
-    _overrides = kwargs.get("_overrides", False)
-    
-    if use_config:
-        config = _get_config()
-        
-        node_id = _overrides['node_id'] or config.nodeinfo.id
-        if not node_id.startswith("!"):
-            raise ValueError("Node ID must start with '!'")
-        channel_id = _overrides['channel_preset'] or config.channel.preset
-        channel_key = _overrides['channel_key'] if _overrides['channel_key'] is not None else config.channel.key
-        #channel_key = config.channel.key
-        gateway_id = node_id.lower()
-        from_id = int(node_id.replace("!", ""), 16)
-        destination = _overrides['destination'] or kwargs.get("to", config.message.destination_id)
-    else:
-        from mmqtt import client
-
-        node_id = _overrides['node_id'] or client.node_id
-        if not node_id.startswith("!"):
-            raise ValueError("Node ID must start with '!'")
-        channel_id = _overrides['channel_preset'] or client.channel
-        channel_key = _overrides['channel_key'] if _overrides['channel_key'] is not None else client.key
-        #channel_key = client.key
-        gateway_id = node_id.lower()
-        from_id = int(node_id.replace("!", ""), 16)
-        destination = _overrides['destination'] or kwargs.get("to", client.destination_id)
-
-    reserved_ids = [1, 2, 3, 4, 4294967295]
-    if from_id in reserved_ids:
-        raise ValueError(f"Node ID '{from_id}' is reserved and cannot be used. Please choose a different ID.")
+    ctx = kwargs.get("_ctx") or _resolve_ctx(**kwargs)
 
     global message_id
-    message_id = get_message_id(message_id)
-
-    mesh_packet = mesh_pb2.MeshPacket()
-    mesh_packet.id = message_id
-    setattr(mesh_packet, "from", from_id)
-    mesh_packet.to = int(destination)
-    mesh_packet.want_ack = kwargs.get("want_ack", False)
-    mesh_packet.channel = generate_hash(channel_id, channel_key)
-    mesh_packet.hop_limit = _overrides['hop_limit'] or kwargs.get("hop_limit", 3)
-    mesh_packet.hop_start = _overrides['hop_limit'] or kwargs.get("hop_start", 3)
-    mesh_packet.priority = _overrides['priority'] or 'DEFAULT'
-
-    if channel_key == "":
-        #mesh_packet.decoded.CopyFrom(encoded_message)
-        mesh_packet.encrypted = encoded_message.SerializeToString()
-    else:
-        mesh_packet.encrypted = encrypt_packet(channel_id, channel_key, mesh_packet, encoded_message)
 
-    service_envelope = mqtt_pb2.ServiceEnvelope()
-    service_envelope.packet.CopyFrom(mesh_packet)
-    service_envelope.channel_id = channel_id
-    service_envelope.gateway_id = gateway_id
+    # Reuse the module-level messages; the lock keeps concurrent senders from sharing them, or the rolling ID, mid-build.
+    with _PACKET_LOCK:
+        message_id = get_message_id(message_id)
+        mesh_packet = _MESH_PACKET
+        mesh_packet.Clear()
+        mesh_packet.id = message_id
+        setattr(mesh_packet, "from", ctx.from_id)
+        mesh_packet.to = ctx.destination
+        mesh_packet.want_ack = kwargs.get("want_ack", False)
+        mesh_packet.channel = generate_hash(ctx.channel_id, ctx.channel_key)
+        mesh_packet.hop_limit = ctx.hop_limit or kwargs.get("hop_limit", 3)
+        mesh_packet.hop_start = ctx.hop_limit or kwargs.get("hop_start", 3)
+        mesh_packet.priority = ctx.priority or 'DEFAULT'
+
+        if ctx.channel_key == "":
+            #mesh_packet.decoded.CopyFrom(encoded_message)
+            mesh_packet.encrypted = encoded_message.SerializePartialToString()
+        else:
+            mesh_packet.encrypted = encrypt_packet(ctx.channel_id, ctx.channel_key, mesh_packet, encoded_message)
+
+        service_envelope = _ENVELOPE
+        service_envelope.Clear()
+        service_envelope.packet.CopyFrom(mesh_packet)
+        service_envelope.channel_id = ctx.channel_id
+        service_envelope.gateway_id = ctx.gateway_id
+
+        return service_envelope.SerializePartialToString()
+
+
+########## Payload Builders ##########
+
 
-    return service_envelope.SerializeToString()
+def _text_payload(portnum: int, data: bytes = None, message: str = None, **kwargs) -> bytes:
+    return create_payload(data, portnum, **kwargs)
+
+
+def _nodeinfo_payload(portnum: int, id: int = None, long_name: str = None, short_name: str = None, **kwargs) -> bytes:
+    nodeinfo_fields = {
+        "id": id,
+        "long_name": long_name,
+        "short_name": short_name,
+    }
+    # Filter out None values and remove keys we've already handled
+    reserved_keys = {"node_id", "long_name", "short_name", "use_config", "_overrides", "_ctx"}
+    data = {k: v for k, v in kwargs.items() if v is not None and k not in reserved_keys}
+    nodeinfo_fields.update(data)
+
+    return create_payload(mesh_pb2.User(**nodeinfo_fields), portnum, **kwargs)
+
+
+def _position_payload(
+    portnum: int, latitude_i: int = None, longitude_i: int = None, alt: int = None, precision: int = None,
+    latitude: float = None, longitude: float = None, **fields
+) -> bytes:
+    position_fields = {
+        "latitude_i": latitude_i,
+        "longitude_i": longitude_i,
+        "altitude": alt,
+        "precision_bits": precision,
+        "location_source": "LOC_MANUAL",
+        "time": int(time.time()),
+    }
+
+    # Filter out None values and remove keys we've already handled
+    reserved_keys = {"use_config", "_overrides", "_ctx"}
+    data = {k: v for k, v in fields.items() if v is not None and k not in reserved_keys}
+    position_fields.update(data)
+    return create_payload(mesh_pb2.Position(**position_fields), portnum, **fields)
+
+
+def _telemetry_payload(portnum: int, metrics_class, metrics_field: str, kwargs: dict) -> bytes:
+    reserved_keys = {"use_config", "_overrides", "_ctx"}
+    metrics_kwargs = {k: v for k, v in kwargs.items() if v is not None and k not in reserved_keys}
+    data = telemetry_pb2.Telemetry(time=int(time.time()), **{metrics_field: metrics_class(**metrics_kwargs)})
+    return create_payload(data, portnum, **kwargs)
+
+
+def _device_metrics_payload(portnum: int, **kwargs) -> bytes:
+    return _telemetry_payload(portnum, telemetry_pb2.DeviceMetrics, "device_metrics", kwargs)
+
+
+def _power_metrics_payload(portnum: int, **kwargs) -> bytes:
+    return _telemetry_payload(portnum, telemetry_pb2.PowerMetrics, "power_metrics", kwargs)
+
+
+def _environment_metrics_payload(portnum: int, **kwargs) -> bytes:
+    return _telemetry_payload(portnum, telemetry_pb2.EnvironmentMetrics, "environment_metrics", kwargs)
+
+
+def _health_metrics_payload(portnum: int, **kwargs) -> bytes:
+    return _telemetry_payload(portnum, telemetry_pb2.HealthMetrics, "health_metrics", kwargs)
 
 
 ########## Specific Message Handlers ##########
 
 
-def send_text_message(message: str = None, **kwargs) -> None:
+def send_text_message(message: str = None, **kwargs) -> Optional[mqtt.MQTTMessageInfo]:
     """Send a text message to the specified destination."""
-    
-    def create_text_payload(portnum: int, message: str = None, **kwargs):
+    try:
         data = message.encode("utf-8")
-        return create_payload(data, portnum, **kwargs)
-    
-    publish_message(create_text_payload, portnums_pb2.TEXT_MESSAGE_APP, message=message, **kwargs)
+    except AttributeError as e:
+        print(f"Error while sending message: {e}")
+        return None
+    return publish_message(_text_payload, _TEXT, message=message, data=data, **kwargs)
 
 
-def send_nodeinfo(id: int = None, long_name: str = None, short_name: str = None, **kwargs) -> None:
+def send_nodeinfo(id: int = None, long_name: str = None, short_name: str = None, **kwargs) -> Optional[mqtt.MQTTMessageInfo]:
     """Send node information including short/long names and hardware model."""
     
     if "hw_model" not in kwargs:
         kwargs["hw_model"] = 255
     
-    def create_nodeinfo_payload(portnum: int, **_):
-    
-        nodeinfo_fields = {
-            "id": id if id is not None else None,
-            "long_name": long_name if long_name is not None else None,
-            "short_name": short_name if short_name is not None else None,
-        }
-        # Filter out None values and remove keys we've already handled
-        reserved_keys = {"node_id", "long_name", "short_name", "use_config", "_overrides"}
-        data = {k: v for k, v in kwargs.items() if v is not None and k not in reserved_keys}
-        nodeinfo_fields.update(data)
-
-        return create_payload(mesh_pb2.User(**nodeinfo_fields), portnum, **kwargs)
-    
-    publish_message(
-        create_nodeinfo_payload, portnums_pb2.NODEINFO_APP, id=id, long_name=long_name, short_name=short_name, **kwargs
+    return publish_message(
+        _nodeinfo_payload, _NODEINFO, id=id, long_name=long_name, short_name=short_name, **kwargs
     )
 
 
 #def send_position(latitude: float = None, longitude: float = None, **kwargs) -> None:
-def send_position(latitude: float = None, longitude: float = None, alt: int = None, precision: int = None, **kwargs) -> None:
+def send_position(latitude: float = None, longitude: float = None, alt: int = None, precision: int = None, **kwargs) -> Optional[mqtt.MQTTMessageInfo]:
     """Send current position with optional additional fields (e.g., ground_speed, fix_type, etc)."""
-    
-    def create_position_payload(portnum: int, **fields):
-        position_fields = {
-            "latitude_i": int(latitude * 1e7) if latitude is not None else None,
-            "longitude_i": int(longitude * 1e7) if longitude is not None else None,
-            "altitude": alt if alt is not None else None,
-            "precision_bits": precision if precision is not None else None,
-            "location_source": "LOC_MANUAL",
-            "time": int(time.time()),
-        }
-
-        # Filter out None values and remove keys we've already handled
-        reserved_keys = {"latitude", "longitude", "use_config", "_overrides"}
-        data = {k: v for k, v in fields.items() if v is not None and k not in reserved_keys}
-        position_fields.update(data)
-        return create_payload(mesh_pb2.Position(**position_fields), portnum, **kwargs)
-    
-    publish_message(
-        create_position_payload, portnums_pb2.POSITION_APP, latitude=latitude, longitude=longitude, **kwargs
+    try:
+        latitude_i = int(latitude * 1e7) if latitude is not None else None
+        longitude_i = int(longitude * 1e7) if longitude is not None else None
+    except (TypeError, ValueError) as e:
+        print(f"Error while sending message: {e}")
+        return None
+    return publish_message(
+        _position_payload, _POSITION,
+        latitude=latitude, longitude=longitude, latitude_i=latitude_i, longitude_i=longitude_i,
+        alt=alt, precision=precision, **kwargs
     )
 
 
-def send_device_telemetry(**kwargs) -> None:
+def send_device_telemetry(**kwargs) -> Optional[mqtt.MQTTMessageInfo]:
     """Send telemetry packet including battery, voltage, channel usage, and uptime."""
-    
-    def create_telemetry_payload(portnum: int, **_):
-        reserved_keys = {"use_config", "_overrides"}
-        metrics_kwargs = {k: v for k, v in kwargs.items() if v is not None and k not in reserved_keys}
-        metrics = telemetry_pb2.DeviceMetrics(**metrics_kwargs)
-        data = telemetry_pb2.Telemetry(time=int(time.time()), device_metrics=metrics)
-        return create_payload(data, portnum, **kwargs)
-    
-    publish_message(create_telemetry_payload, portnums_pb2.TELEMETRY_APP, **kwargs)
+    return publish_message(_device_metrics_payload, _TELEMETRY, **kwargs)
 
 
-def send_power_metrics(**kwargs) -> None:
+def send_power_metrics(**kwargs) -> Optional[mqtt.MQTTMessageInfo]:
     """Send power metrics including voltage and current for three channels."""
-    
-    def create_power_metrics_payload(portnum: int, **_):
-        reserved_keys = {"use_config", "_overrides"}
-        metrics_kwargs = {k: v for k, v in kwargs.items() if v is not None and k not in reserved_keys}
-        metrics = telemetry_pb2.PowerMetrics(**metrics_kwargs)
-        data = telemetry_pb2.Telemetry(time=int(time.time()), power_metrics=metrics)
-        return create_payload(data, portnum, **kwargs)
-    
-    publish_message(create_power_metrics_payload, portnums_pb2.TELEMETRY_APP, **kwargs)
+    return publish_message(_power_metrics_payload, _TELEMETRY, **kwargs)
 
 
-def send_environment_metrics(**kwargs) -> None:
+def send_environment_metrics(**kwargs) -> Optional[mqtt.MQTTMessageInfo]:
     """Send environment metrics including temperature, humidity, pressure, and gas resistance."""
-    
-    def create_environment_metrics_payload(portnum: int, **_):
-        # Filter out None values from kwargs
-        reserved_keys = {"use_config", "_overrides"}
-        metrics_kwargs = {k: v for k, v in kwargs.items() if v is not None and k not in reserved_keys}
-        metrics = telemetry_pb2.EnvironmentMetrics(**metrics_kwargs)
-        data = telemetry_pb2.Telemetry(time=int(time.time()), environment_metrics=metrics)
-        return create_payload(data, portnum, **kwargs)
-    
-    publish_message(create_environment_metrics_payload, portnums_pb2.TELEMETRY_APP, **kwargs)
+    return publish_message(_environment_metrics_payload, _TELEMETRY, **kwargs)
 
 
-def send_health_metrics(**kwargs) -> None:
+def send_health_metrics(**kwargs) -> Optional[mqtt.MQTTMessageInfo]:
     """Send health metrics including heart rate, SpO2, and body temperature."""
-    
-    def create_health_metrics_payload(portnum: int, **_):
-        reserved_keys = {"use_config", "_overrides"}
-        metrics_kwargs = {k: v for k, v in kwargs.items() if v is not None and k not in reserved_keys}
-        metrics = telemetry_pb2.HealthMetrics(**metrics_kwargs)
-        data = telemetry_pb2.Telemetry(time=int(time.time()), health_metrics=metrics)
-        return create_payload(data, portnum, **kwargs)
-    
-    publish_message(create_health_metrics_payload, portnums_pb2.TELEMETRY_APP, **kwargs)
+    return publish_message(_health_metrics_payload, _TELEMETRY, **kwargs)
@@ -1,5 +1,10 @@
 from meshtastic.protobuf import portnums_pb2
+import argparse
+import math
+import os
 import random
+import signal
+import threading
 
 
 def get_portnum_name(portnum) -> str:
@@ -23,6 +28,28 @@ def get_message_id(rolling_message_id: int, max_message_id: int = 4294967295) ->
     return message_id
 
 
+def wait_for_interrupt() -> None:
+    """
+    Block until SIGINT (Ctrl+C) is received, then restore the previous SIGINT handler.
+    Off the main thread no handler can be installed, so this blocks until the process exits.
+    """
+    stop = threading.Event()
+    previous = signal.getsignal(signal.SIGINT)
+    try:
+        signal.signal(signal.SIGINT, lambda *_: stop.set())
+    except ValueError:
+        previous = None
+
+    # Untimed waits ignore Ctrl+C on Windows, so wake up periodically there.
+    timeout = 0.5 if os.name == "nt" else None
+    try:
+        while not stop.wait(timeout):
+            pass
+    finally:
+        if previous is not None:
+            signal.signal(signal.SIGINT, previous)
+
+
 def validate_lat_lon_alt(parser, args) -> None:
     # Check if --alt is provided
     if args.alt:
@@ -52,6 +79,16 @@ def float_or_int(value):
             raise argparse.ArgumentTypeError(f"{value} is not a valid int or float")
 
 
+def non_negative_float(value):
+    try:
+        fvalue = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value} is not a valid number")
+    if not math.isfinite(fvalue) or fvalue < 0:
+        raise argparse.ArgumentTypeError(f"{value} must be a finite number of 0 or more")
+    return fvalue
+
+
 def str2bool(v):
     if isinstance(v, bool):
         return v